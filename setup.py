@@ -14,6 +14,8 @@ setup(
     ''',
     install_requires=[
         'livetiming-core',
+        'lxml',
+        'treq',
     ],
     entry_points={
         'livetiming.services': [
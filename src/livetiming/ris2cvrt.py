@@ -1,20 +1,72 @@
 from typing import Dict, List, Optional
-import re
+import functools
 import time
+import hashlib
+import atexit
 import json
 import logging
+import logging.handlers
+import queue
 
-import requests
-from bs4 import BeautifulSoup
-import xml.etree.ElementTree as ET
+import treq
+from twisted.internet import defer
+from twisted.internet.task import LoopingCall
 
 from livetiming.racing import Stat
 from livetiming.service import BaseService
 
+# Prefer lxml's C parsers; fall back to the stdlib XML parser and
+# BeautifulSoup if it's missing.
+try:
+    from lxml import etree as ET, html as lh
+except ImportError:
+    import xml.etree.ElementTree as ET
+    from bs4 import BeautifulSoup
+    lh = None
+
+try:
+    import orjson
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj, default=str).decode('utf-8')
+except ImportError:
+    def _dumps(obj) -> str:
+        return json.dumps(obj, default=str)
+
 # URLs passed to fetchers must be bytes, not strings.
 DATA_SOURCE_URL = b'https://results.ris-timing.be/2cvrt/live/live2025.htm'
 
+# Seconds to wait before probing for an XML feed again after finding none.
+XML_REPROBE_INTERVAL = 3600
+
+# Upper bound, in seconds, on the back-off between fetches while the source is failing.
+MAX_RETRY_BACKOFF = 60
+
+# Cell values meaning "no time".
+_NO_TIME = frozenset(('-', '—', 'NA', 'N/A'))
+
+# XML elements that hold one car each.
+_CAR_TAGS = frozenset(('ligne', 'line', 'car', 'row', 'item'))
+
+# How many leading cells of a table to look at when deciding if it's the live one.
+_HEAD_CELLS = 15
+
+# Header labels (lowercased) we recognise for each column, in order of preference.
+_COLUMN_ALIASES = {
+    'pos': ('pos', 'position'),
+    'state': ('now', 'state', 'status'),
+    'num': ('num', '#', 'car', 'n°', 'nº'),
+    'team': ('team', 'name'),
+    'drivers': ('drivers', 'driver', 'pilote', 'pilotes'),
+    'last': ('last', 'last time', 'last lap', 'dernier', 'dernier tour'),
+    'best': ('best', 'best time', 'best lap', 'meilleur', 'meilleur tour'),
+    'lap': ('lap', 'laps', 'tour', 'tours'),
+    'gap': ('gap', 'ecart', 'écart'),
+}
 
+
+# The same strings come round poll after poll (best laps especially).
+@functools.lru_cache(maxsize=4096)
 def _parse_lap_time(txt: str) -> Optional[float]:
     """
     Convert strings like '1:23.456' or '23.456' into seconds (float).
@@ -23,20 +75,312 @@ def _parse_lap_time(txt: str) -> Optional[float]:
     if not txt:
         return None
     t = txt.strip()
-    if not t or t in {'-', '—', 'NA', 'N/A'}:
+    if not t or t in _NO_TIME:
         return None
     # Accept formats: M:SS.xxx  or  SS.xxx
-    m = re.match(r'^(?:(\d+):)?(\d{1,2})(?:[.,](\d{1,3}))?$', t)
-    if not m:
+    # Split by hand rather than with a regex: this runs for every cell on every poll.
+    head, sep, frac = t.replace(',', '.').partition('.')
+    minutes, colon, seconds = head.rpartition(':')
+    if colon and not minutes.isdigit():
+        return None
+    if not seconds.isdigit() or len(seconds) > 2:
+        return None
+    if sep and (not frac.isdigit() or len(frac) > 3):
+        return None
+    try:
+        millis = int(frac.ljust(3, '0')) if frac else 0  # normalize to ms
+        return int(minutes or 0) * 60 + int(seconds) + millis / 1000.0
+    except ValueError:
+        # str.isdigit() also admits the likes of superscripts
+        return None
+
+
+def _charset(content_type: Optional[str]) -> Optional[str]:
+    """
+    The charset parameter of a Content-Type header value, if any.
+    """
+    for param in (content_type or '').split(';')[1:]:
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'charset':
+            return value.strip().strip('"\'') or None
+    return None
+
+
+def _html_encoding(html, encoding: Optional[str]) -> Optional[str]:
+    # The charset from the HTTP headers wins. Without one, read the body as
+    # UTF-8 if it is valid UTF-8, since a page with no <meta charset> would
+    # otherwise be read as latin-1; failing that, leave the parser to work it
+    # out from the document. The body itself always stays as bytes.
+    if encoding or not isinstance(html, bytes) or html.isascii():
+        return encoding
+    try:
+        html.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    return 'utf-8'
+
+
+def _get(url, timeout, headers=None):
+    """
+    GET url, firing with (response, body). The timeout covers reading the body
+    as well as the headers, and the body is read whatever the status so the
+    pooled connection is released.
+    """
+    from twisted.internet import reactor
+
+    @defer.inlineCallbacks
+    def get():
+        r = yield treq.get(url, headers=headers)
+        body = yield treq.content(r)
+        return r, body
+
+    return get().addTimeout(timeout, reactor)
+
+
+# Thin wrappers over the HTML tree so the scraping code below doesn't care
+# whether lxml or BeautifulSoup did the parsing.
+if lh is not None:
+    _XPATHS = {
+        'table': ET.XPath('//table'),
+        'tr': ET.XPath('.//tr'),
+        'th': ET.XPath('.//th'),
+        'td': ET.XPath('.//td'),
+        ('th', 'td'): ET.XPath('.//th|.//td'),
+    }
+    _XP_HEAD_CELLS = ET.XPath('(.//th|.//td)[position() <= {}]'.format(_HEAD_CELLS))
+
+    @functools.lru_cache(maxsize=None)
+    def _html_parser(encoding):
+        return lh.HTMLParser(encoding=encoding)
+
+    def _parse_html(html, encoding=None):
+        encoding = _html_encoding(html, encoding)
+        try:
+            parser = _html_parser(encoding) if encoding and isinstance(html, bytes) else None
+        except LookupError:
+            # Unknown charset name; let libxml2 work it out
+            parser = None
+        try:
+            return lh.fromstring(html, parser=parser)
+        except ET.ParserError:
+            # Empty document
+            return None
+
+    def _find_all(el, name):
+        return _XPATHS[name](el)
+
+    def _head_cells(table):
+        return _XP_HEAD_CELLS(table)
+
+    def _text(el) -> str:
+        return ' '.join(' '.join(el.itertext()).split()) if el is not None else ''
+else:
+    def _parse_html(html, encoding=None):
+        if isinstance(html, bytes):
+            return BeautifulSoup(html, 'html.parser', from_encoding=_html_encoding(html, encoding))
+        return BeautifulSoup(html, 'html.parser')
+
+    def _find_all(el, name):
+        return el.find_all(list(name) if isinstance(name, tuple) else name)
+
+    def _head_cells(table):
+        return table.find_all(['th', 'td'], limit=_HEAD_CELLS)
+
+    def _text(el) -> str:
+        return ' '.join(el.get_text(separator=' ', strip=True).split()) if el else ''
+
+
+def _scrape_cars(doc) -> List[Dict]:
+    """
+    Extract car rows from the main live table of a parsed R.I.S. page.
+    """
+    # --- Find the main live table ---
+    table = None
+    # 1) Prefer a table with typical RIS headers present
+    tables = _find_all(doc, 'table')
+    for candidate in tables:
+        headers = _head_cells(candidate)
+        head_txt = ' '.join(_text(h) for h in headers).lower()
+        if any(k in head_txt for k in ['pos', 'now', 'num', 'team', 'drivers', 'best', 'last']):
+            table = candidate
+            break
+    # 2) Fallback: the first sizable table
+    if table is None and tables:
+        table = tables[0]
+    if table is None:
+        return []
+
+    cars: List[Dict] = []
+
+    # Build header map (col name -> index), tolerant to wording
+    rows = _find_all(table, 'tr')
+    header_idx = None
+    for i, tr in enumerate(rows):
+        # Pick the first row that looks like headers (many th OR recognizable labels)
+        ths = _find_all(tr, 'th')
+        tds = _find_all(tr, 'td')
+        cells = ths if ths else tds
+        labels = [_text(c).lower() for c in cells]
+        if any(lbl in labels for lbl in ['pos', 'now', 'num', '#', 'team', 'drivers', 'last', 'best', 'best time']):
+            header_idx = i
+            if ths and tds:
+                # Mixed row: index against every cell, as the data rows are
+                labels = [_text(c).lower() for c in _find_all(tr, ('th', 'td'))]
+            break
+
+    col_idx: Dict[str, int] = {}
+    if header_idx is not None:
+        # label -> index of its first occurrence
+        label_index: Dict[str, int] = {}
+        for ci, lbl in enumerate(labels):
+            label_index.setdefault(lbl, ci)
+        col_idx = {
+            k: next((label_index[a] for a in alts if a in label_index), None)
+            for k, alts in _COLUMN_ALIASES.items()
+        }
+
+        # Data rows = rows after header_row
+        for tr in rows[header_idx + 1:]:
+            tds = _find_all(tr, 'td')
+            if not tds:
+                continue
+
+            def get(idx_name: str) -> str:
+                i = col_idx.get(idx_name)
+                return _text(tds[i]) if (i is not None and i < len(tds)) else ''
+
+            num = get('num')
+            if not num:
+                # Skip empty lines or separators
+                continue
+
+            # Build a row for timing71
+            team_txt = get('team')
+            drv_txt = get('drivers')
+            who = team_txt or drv_txt
+
+            last_raw = get('last')
+            best_raw = get('best')
+
+            row = {
+                Stat.NUM.key: num,
+                Stat.STATE.key: get('state') or '',    # RUN, PIT, STOP, etc (if available)
+                Stat.DRIVER.key: who,
+                Stat.LAST_LAP.key: _parse_lap_time(last_raw),
+                Stat.BEST_LAP.key: _parse_lap_time(best_raw),
+            }
+            cars.append(row)
+
+    return cars
+
+
+def _xml_cars(root) -> List[Dict]:
+    """
+    Extract car rows from a parsed R.I.S. XML feed.
+    """
+    cars: List[Dict] = []
+    # One walk over the tree rather than a findall() per tag name;
+    # lxml can do the tag filtering itself.
+    if lh is not None:
+        car_nodes = root.iter(*_CAR_TAGS)
+    else:
+        car_nodes = [n for n in root.iter() if n.tag in _CAR_TAGS]
+
+    for node in car_nodes:
+        # gather child text into a dict
+        # (lxml yields comments/PIs as children too; their tag isn't a str)
+        children = {c.tag.lower(): (c.text or '').strip() for c in node if isinstance(c.tag, str)}
+
+        def cget(*alts):
+            for a in alts:
+                v = children.get(a)
+                if v:
+                    return v
+            return ''
+
+        num = cget('num', 'number', 'car', '#', 'n', 'n°', 'nº')
+        who = cget('team', 'drivers', 'driver', 'pilote')
+        last_raw = cget('last', 'lastlap', 'last_time', 'dernier')
+        best_raw = cget('best', 'bestlap', 'best_time', 'meilleur')
+        row = {
+            Stat.NUM.key: num,
+            Stat.STATE.key: cget('state', 'now', 'status') or '',
+            Stat.DRIVER.key: who,
+            Stat.LAST_LAP.key: _parse_lap_time(last_raw),
+            Stat.BEST_LAP.key: _parse_lap_time(best_raw),
+        }
+        # skip empty rows
+        if num:
+            cars.append(row)
+
+    return cars
+
+
+class _RemainingClock:
+    """
+    Session time remaining, from the XML feed's <remain> text. Unchanged text
+    isn't parsed again, and when a poll lacks it we count down locally from
+    the last value seen.
+    """
+
+    def __init__(self):
+        self._txt = None
+        self._seconds = None
+        self._at = None
+
+    def update(self, remain_txt: str, now: float) -> Optional[int]:
+        if remain_txt and remain_txt == self._txt:
+            # Unchanged since last poll (e.g. clock held during a stoppage):
+            # still correct as of now, so count down from here if it goes missing.
+            self._at = now
+            return self._seconds
+        if remain_txt:
+            # Parse HH:MM:SS or MM:SS
+            remaining = None
+            try:
+                parts = [int(p) for p in remain_txt.split(':')]
+                if len(parts) == 3:
+                    remaining = parts[0]*3600 + parts[1]*60 + parts[2]
+                elif len(parts) == 2:
+                    remaining = parts[0]*60 + parts[1]
+                elif len(parts) == 1:
+                    remaining = parts[0]
+            except Exception:
+                remaining = None
+            if remaining is not None:
+                self._txt = remain_txt
+                self._seconds = remaining
+                self._at = now
+            return remaining
+        if self._at is not None:
+            # Missing this time: count down from the last value we did see
+            return max(0, self._seconds - int(now - self._at))
         return None
-    minutes = int(m.group(1) or 0)
-    seconds = int(m.group(2))
-    millis = int((m.group(3) or '0').ljust(3, '0'))  # normalize to ms
-    return minutes * 60 + seconds + millis / 1000.0
 
 
-def _text(el) -> str:
-    return re.sub(r'\s+', ' ', (el.get_text(separator=' ', strip=True) if el else '')).strip()
+def _setup_out_logger() -> logging.Logger:
+    """
+    Set up a simple logger that writes each scrape to a file and to stdout
+    so the plugin's scraping output can be observed in real time.
+    Called from Service.__init__ rather than at import, so merely importing
+    this module doesn't start a thread.
+    """
+    logger = logging.getLogger('ris2cvrt')
+    if not logger.handlers:
+        logger.setLevel(logging.INFO)
+        # delay=True: the file isn't opened until something is first logged.
+        fh = logging.FileHandler('ris2cvrt_scrape.log', delay=True)
+        fh.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+        sh = logging.StreamHandler()
+        sh.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+        # The actual writes happen on a listener thread, so a slow disk or
+        # console doesn't hold up the poll.
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        listener = logging.handlers.QueueListener(log_queue, fh, sh)
+        listener.start()
+        atexit.register(listener.stop)
+    return logger
 
 
 class Service(BaseService):
@@ -45,8 +389,8 @@ class Service(BaseService):
     https://results.ris-timing.be/2cvrt/live/live2025.htm
     """
 
-    # We'll just poll on our own by implementing getRaceState() and enabling auto_poll.
-    auto_poll = True
+    # We poll and publish ourselves (see start()) so fetches don't block the reactor.
+    auto_poll = False
 
     # Give attribution to your data source! Name and optional URL.
     attribution = ['R.I.S. Timing', 'https://results.ris-timing.be/']
@@ -57,17 +401,25 @@ class Service(BaseService):
         self._last_session_name = None
         self._last_flag = None
         self._last_remaining = None
-        # Setup a simple logger that writes each scrape to a file and to stdout
-        # so the plugin's scraping output can be observed in real time.
-        self._out_logger = logging.getLogger('ris2cvrt')
-        if not self._out_logger.handlers:
-            self._out_logger.setLevel(logging.INFO)
-            fh = logging.FileHandler('ris2cvrt_scrape.log')
-            fh.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
-            self._out_logger.addHandler(fh)
-            sh = logging.StreamHandler()
-            sh.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
-            self._out_logger.addHandler(sh)
+        # Most recently fetched state, as handed out by getRaceState().
+        self._state = None
+        # Validators from the last parsed response, so unchanged pages come back as 304.
+        self._etag = None
+        self._last_modified = None
+        self._cached_state = None
+        # Digest of the last parsed body, for servers that don't send validators.
+        self._last_body_hash = None
+        # Consecutive fetch failures, and when we may next try the source.
+        self._failures = 0
+        self._retry_after = 0
+        # XML feed URL once discovered, and when we may next look for one.
+        self._xml_url = None
+        self._xml_next_probe = 0
+        # Consecutive failures of the discovered feed, and when to try it again.
+        self._xml_failures = 0
+        self._xml_retry_after = 0
+        self._remaining_clock = _RemainingClock()
+        self._out_logger = _setup_out_logger()
 
     def getName(self):
         return 'RIS 2CVRT Live'
@@ -96,56 +448,165 @@ class Service(BaseService):
         # Not provided by this page
         return []
 
-    # --- Core polling hook ---
+    def _restamp(self, state, **session):
+        # Shallow copy of a previously returned state with a fresh clock.
+        return {**state, 'session': {**state['session'], 'clock': int(time.time()), **session}}
+
+    def _stale_state(self):
+        # The last good state, flagged as such, if we have one.
+        if self._cached_state is not None:
+            return self._restamp(self._cached_state, source_ok=False)
+        return {
+            'cars': [],
+            'session': {
+                'name': self._last_session_name or '2CVRT',
+                'flag': self._last_flag or '',
+                'remaining': self._last_remaining,  # seconds or None
+                'clock': int(time.time()),
+                'source_ok': False,
+            }
+        }
+
+    def _back_off(self):
+        # Another consecutive failure: wait exponentially longer before the next try.
+        self._last_fetch_ok = False
+        self._failures += 1
+        self._retry_after = time.time() + min(2 ** (self._failures - 1), MAX_RETRY_BACKOFF)
+
+    # --- Polling ---
+    def start(self):
+        LoopingCall(self._poll).start(self.getPollInterval())
+        super().start()
+
+    def _poll(self):
+        # LoopingCall waits on the returned Deferred, so polls never overlap.
+        d = self._fetchRaceState()
+        d.addCallback(self._publish)
+        d.addErrback(self._poll_failed)
+        return d
+
+    def _poll_failed(self, failure):
+        # Something broke past the fetch (parsing, say). Handle it like a failed
+        # fetch rather than leave the last state up as live; never propagate,
+        # as a failure would stop the LoopingCall.
+        self.log.failure('Poll failed: {log_failure}', failure=failure)
+        self._back_off()
+        try:
+            self._publish(self._stale_state())
+        except Exception:
+            self.log.failure('Publishing stale state failed')
+
+    def _publish(self, state):
+        self._state = state
+        self._updateAndPublishRaceState()
+
     def getRaceState(self):
+        if self._state is None:
+            return self._stale_state()
+        return self._state
+
+    @defer.inlineCallbacks
+    def _fetch_xml(self, url):
+        """
+        Fetch url, returning (root, cars) if it's a well-formed XML feed with car
+        rows in it, else None.
+        """
+        xr, body = yield _get(url, 5)
+        # Sniff the first bytes to tell a real feed from an HTML error page.
+        if xr.code != 200 or not body[:64].lstrip().startswith(b'<?xml'):
+            return None
+        try:
+            # Raw bytes: lxml rejects str input carrying an encoding declaration.
+            root = ET.fromstring(body)
+        except Exception:
+            self.log.failure('Exception parsing XML from {url}: {log_failure}', url=url)
+            return None
+        # A feed without cars is no use to us: the HTML page has them.
+        cars = _xml_cars(root)
+        return (root, cars) if cars else None
+
+    @defer.inlineCallbacks
+    def _fetchRaceState(self):
         """
         Fetch and parse the R.I.S. live HTML and convert to timing71 state.
         """
         url = DATA_SOURCE_URL.decode('utf-8')
 
-        # Try to fetch the XML endpoint first (RIS publishes .xml files frequently).
-        # We'll try a couple of reasonable derived locations based on the HTML URL,
-        # then fall back to the original HTML parsing if XML is unavailable.
-        xml_text = None
-        xml_url_tried = None
-        try:
-            base_no_ext = url.rsplit('.', 1)[0]
-            candidates = [f"{base_no_ext}.xml"]
-            # Also try replacing the filename with the same name + .xml
-            filename = url.rsplit('/', 1)[-1]
-            if '.' in filename:
-                candidates.append(url.replace(filename, filename.rsplit('.', 1)[0] + '.xml'))
-
-            for xu in candidates:
-                try:
-                    xr = requests.get(xu, timeout=5)
-                    if xr.status_code == 200 and xr.text and xr.text.lstrip().startswith('<?xml'):
-                        xml_text = xr.text
-                        xml_url_tried = xu
-                        break
-                except Exception:
-                    continue
-        except Exception:
-            xml_text = None
+        if time.time() < self._retry_after:
+            # Still backing off from a failing source.
+            return self._stale_state()
 
-        if xml_text is not None:
-            # Parse XML
+        # Try to fetch the XML endpoint first (RIS publishes .xml files frequently).
+        # We probe a couple of reasonable derived locations based on the HTML URL
+        # once, remember the first that parses and lists cars, and fall back to
+        # the original HTML parsing if XML is unavailable. If no feed turns up,
+        # probing isn't retried until XML_REPROBE_INTERVAL has passed, so polls
+        # don't pay for it every time; a feed we've found is kept through
+        # failures (including losing its car rows), retried with the same
+        # back-off as the HTML source.
+        root = None
+        xml_cars: List[Dict] = []
+        candidates = []
+        if self._xml_url:
+            if time.time() >= self._xml_retry_after:
+                candidates = [self._xml_url]
+        elif time.time() >= self._xml_next_probe:
             try:
-                root = ET.fromstring(xml_text)
-            except Exception as e:
-                # XML parse failed; log and fall back to HTML scraping
-                try:
-                    self.log.failure("Exception parsing XML: {log_failure}")
-                except Exception:
-                    pass
-                xml_text = None
+                base_no_ext = url.rsplit('.', 1)[0]
+                candidates = [f"{base_no_ext}.xml"]
+                # Also try replacing the filename with the same name + .xml
+                filename = url.rsplit('/', 1)[-1]
+                if '.' in filename:
+                    alt = url.replace(filename, filename.rsplit('.', 1)[0] + '.xml')
+                    if alt not in candidates:
+                        candidates.append(alt)
+            except Exception:
+                candidates = []
+
+        if candidates:
+            # Try every candidate at once rather than one round trip after another.
+            results = yield defer.DeferredList(
+                [self._fetch_xml(xu) for xu in candidates],
+                consumeErrors=True,
+            )
+            for xu, (ok, feed) in zip(candidates, results):
+                if ok and feed is not None:
+                    root, xml_cars = feed
+                    self._xml_url = xu
+                    break
 
-        if xml_text is None:
+        if root is not None:
+            self._xml_failures = 0
+        elif candidates and self._xml_url:
+            # The known feed failed this time; HTML fills in until it's back.
+            self._xml_failures += 1
+            self._xml_retry_after = time.time() + min(2 ** (self._xml_failures - 1), MAX_RETRY_BACKOFF)
+        elif candidates:
+            # Nothing published: stop probing for a while.
+            self._xml_next_probe = time.time() + XML_REPROBE_INTERVAL
+
+        if root is None:
             # fallback to HTML fetch
             try:
-                r = requests.get(url, timeout=10)
-                r.raise_for_status()
-                html = r.text
+                headers = {}
+                if self._cached_state is not None:
+                    if self._etag:
+                        headers['If-None-Match'] = self._etag
+                    if self._last_modified:
+                        headers['If-Modified-Since'] = self._last_modified
+                # treq pools connections, so the HTTPS connection is kept alive between polls.
+                r, html = yield _get(url, 10, headers=headers)
+                if r.code >= 400:
+                    raise Exception('HTTP {}'.format(r.code))
+                self._failures = 0
+                if r.code == 304 and self._cached_state is not None:
+                    self._last_fetch_ok = True
+                    return self._restamp(self._cached_state)
+                charset = _charset(r.headers.getRawHeaders('Content-Type', [None])[0])
+                body_hash = hashlib.blake2b(html, digest_size=16).digest()
+                if body_hash == self._last_body_hash and self._cached_state is not None:
+                    self._last_fetch_ok = True
+                    return self._restamp(self._cached_state)
                 self._last_fetch_ok = True
             except Exception as e:
                 # Log to twisted logger and our own output logger so the error is visible.
@@ -158,23 +619,14 @@ class Service(BaseService):
                 except Exception:
                     # Best-effort: print if logger failed
                     print(f'Fetch failed: {e}', flush=True)
-                self._last_fetch_ok = False
-                # Return whatever we can (empty cars, keep prior session if available)
-                return {
-                    'cars': [],
-                    'session': {
-                        'name': self._last_session_name or '2CVRT',
-                        'flag': self._last_flag or '',
-                        'remaining': self._last_remaining,  # seconds or None
-                        'clock': int(time.time()),
-                        'source_ok': False,
-                    }
-                }
+                self._back_off()
+                # Return whatever we can (last good cars if we have them, else none)
+                return self._stale_state()
 
-        # If xml_text was present we will parse XML below; otherwise parse HTML.
-        soup = None
-        if xml_text is None:
-            soup = BeautifulSoup(html, 'html.parser')
+        # If the XML feed answered we will parse XML below; otherwise parse HTML.
+        doc = None
+        if root is None:
+            doc = _parse_html(html, charset)
 
         # --- Try to discover session meta (flag, remaining, label) if present ---
         session_name = None
@@ -182,190 +634,51 @@ class Service(BaseService):
         remaining = None  # seconds
 
         # If we have XML, extract session info from <lineinfo>
-        if xml_text is not None:
+        if root is not None:
             try:
-                lineinfo = root.find('.//lineinfo') or root.find('lineinfo')
+                lineinfo = root.find('.//lineinfo')
+                if lineinfo is None:
+                    lineinfo = root.find('lineinfo')
                 if lineinfo is not None:
                     session_name = (lineinfo.findtext('seance') or lineinfo.findtext('race') or '').strip()
                     # messageDC2 often contains flag text like 'GREEN FLAG'
                     flag = (lineinfo.findtext('messageDC2') or lineinfo.findtext('messageDC1') or '').strip()
                     remain_txt = (lineinfo.findtext('remain') or '').strip()
-                    if remain_txt:
-                        # Parse HH:MM:SS or MM:SS
-                        parts = remain_txt.split(':')
-                        try:
-                            parts = [int(p) for p in parts]
-                            if len(parts) == 3:
-                                remaining = parts[0]*3600 + parts[1]*60 + parts[2]
-                            elif len(parts) == 2:
-                                remaining = parts[0]*60 + parts[1]
-                            elif len(parts) == 1:
-                                remaining = parts[0]
-                        except Exception:
-                            remaining = None
+                    remaining = self._remaining_clock.update(remain_txt, time.time())
 
             except Exception:
                 # don't fail entirely on XML parsing errors
                 pass
-        else:
-            # Many RIS pages have a header line like: "Race :  Session :  DAY TIME :  REMAIN :"
-            # If not found, we keep them as None/empty.
-            # Heuristic: look for any small header/banner text with "REMAIN" or "DAY TIME"
-            banner = soup.find(text=re.compile(r'REMAIN|DAY\s*TIME', re.I))
-            if banner:
-                # Often values are adjacent; we keep it simple and leave as None if we can’t confidently parse.
-                pass
 
-        # --- Find the main live table ---
-        table = None
-        # 1) Prefer a table with typical RIS headers present
-        for candidate in soup.find_all('table'):
-            headers = [h for h in candidate.find_all(['th', 'td'])]
-            head_txt = ' '.join(_text(h).lower() for h in headers[:15])
-            if any(k in head_txt for k in ['pos', 'now', 'num', 'team', 'drivers', 'best', 'last']):
-                table = candidate
-                break
-        # 2) Fallback: the first sizable table
-        if table is None:
-            tables = soup.find_all('table')
-            if tables:
-                table = tables[0]
-
-        cars: List[Dict] = []
-
-        # If we parsed XML, try to extract car rows from XML structure first.
-        if xml_text is not None:
-            try:
-                car_nodes = []
-                for tag in ('ligne', 'line', 'car', 'row', 'item'):
-                    car_nodes.extend(root.findall('.//{}'.format(tag)))
-
-                for node in car_nodes:
-                    # gather child text into a dict
-                    children = {c.tag.lower(): (c.text or '').strip() for c in list(node)}
-
-                    def cget(*alts):
-                        for a in alts:
-                            v = children.get(a)
-                            if v:
-                                return v
-                        return ''
-
-                    num = cget('num', 'number', 'car', '#', 'n', 'n°', 'nº')
-                    who = cget('team', 'drivers', 'driver', 'pilote')
-                    last_raw = cget('last', 'lastlap', 'last_time', 'dernier')
-                    best_raw = cget('best', 'bestlap', 'best_time', 'meilleur')
-                    row = {
-                        Stat.NUM.key: num,
-                        Stat.STATE.key: cget('state', 'now', 'status') or '',
-                        Stat.DRIVER.key: who,
-                        Stat.LAST_LAP.key: _parse_lap_time(last_raw),
-                        Stat.BEST_LAP.key: _parse_lap_time(best_raw),
-                    }
-                    # skip empty rows
-                    if num:
-                        cars.append(row)
-            except Exception:
-                # If XML doesn't include car rows or format is unexpected, fall back to HTML parsing below.
-                cars = []
-
-        # If we didn't get cars from XML, fall back to HTML table scraping.
-        if not cars and table:
-            # Build header map (col name -> index), tolerant to wording
-            header_row = None
-            for tr in table.find_all('tr'):
-                # Pick the first row that looks like headers (many th OR recognizable labels)
-                ths = tr.find_all('th')
-                tds = tr.find_all('td')
-                cells = ths if ths else tds
-                labels = [_text(c).lower() for c in cells]
-                if any(lbl in labels for lbl in ['pos', 'now', 'num', '#', 'team', 'drivers', 'last', 'best', 'best time']):
-                    header_row = tr
-                    break
-
-            col_idx: Dict[str, int] = {}
-            if header_row:
-                labels = [_text(c).lower() for c in header_row.find_all(['th', 'td'])]
-                def idx(*alts) -> Optional[int]:
-                    for a in alts:
-                        if a in labels:
-                            return labels.index(a)
-                    return None
-
-                col_idx = {
-                    'pos': idx('pos', 'position'),
-                    'state': idx('now', 'state', 'status'),
-                    'num': idx('num', '#', 'car', 'n°', 'nº'),
-                    'team': idx('team', 'name'),
-                    'drivers': idx('drivers', 'driver', 'pilote', 'pilotes'),
-                    'last': idx('last', 'last time', 'last lap', 'dernier', 'dernier tour'),
-                    'best': idx('best', 'best time', 'best lap', 'meilleur', 'meilleur tour'),
-                    'lap': idx('lap', 'laps', 'tour', 'tours'),
-                    'gap': idx('gap', 'ecart', 'écart'),
-                }
-
-                # Data rows = rows after header_row
-                started = False
-                for tr in table.find_all('tr'):
-                    if tr is header_row:
-                        started = True
-                        continue
-                    if not started:
-                        continue
-
-                    tds = tr.find_all('td')
-                    if not tds:
-                        continue
-
-                    def get(idx_name: str) -> str:
-                        i = col_idx.get(idx_name)
-                        return _text(tds[i]) if (i is not None and i < len(tds)) else ''
-
-                    num = get('num')
-                    if not num:
-                        # Skip empty lines or separators
-                        continue
-
-                    # Build a row for timing71
-                    team_txt = get('team')
-                    drv_txt = get('drivers')
-                    who = team_txt or drv_txt
-
-                    last_raw = get('last')
-                    best_raw = get('best')
-
-                    row = {
-                        Stat.NUM.key: num,
-                        Stat.STATE.key: get('state') or '',    # RUN, PIT, STOP, etc (if available)
-                        Stat.DRIVER.key: who,
-                        Stat.LAST_LAP.key: _parse_lap_time(last_raw),
-                        Stat.BEST_LAP.key: _parse_lap_time(best_raw),
-                    }
-                    cars.append(row)
+        if root is not None:
+            cars = xml_cars
+        else:
+            cars = _scrape_cars(doc) if doc is not None else []
 
         # Emit the scraped payload to the out logger (file + stdout) so the
         # plugin operator can observe exactly what was parsed in real time.
-        try:
-            payload = {
-                'timestamp': int(time.time()),
-                'source_url': url,
-                'cars': cars,
-                'session': {
-                    'name': self._last_session_name or '2CVRT',
-                    'flag': self._last_flag or '',
-                    'remaining': self._last_remaining,
-                    'clock': int(time.time()),
-                    'source_ok': True,
-                }
-            }
-            # Log as compact JSON to the file/console
-            self._out_logger.info(json.dumps(payload, default=str))
-        except Exception:
-            # Never let logging break the scraper
+        if self._out_logger.isEnabledFor(logging.INFO):
             try:
-                self._out_logger.exception('Failed to log payload')
+                payload = {
+                    'timestamp': int(time.time()),
+                    'source_url': url,
+                    'cars': cars,
+                    'session': {
+                        'name': self._last_session_name or '2CVRT',
+                        'flag': self._last_flag or '',
+                        'remaining': self._last_remaining,
+                        'clock': int(time.time()),
+                        'source_ok': True,
+                    }
+                }
+                # Log as compact JSON to the file/console
+                self._out_logger.info(_dumps(payload))
             except Exception:
-                pass
+                # Never let logging break the scraper
+                try:
+                    self._out_logger.exception('Failed to log payload')
+                except Exception:
+                    pass
 
         # Keep last known values in case the banner/session is sparse
         if session_name:
@@ -375,7 +688,7 @@ class Service(BaseService):
         if remaining is not None:
             self._last_remaining = remaining
 
-        return {
+        state = {
             'cars': cars,
             'session': {
                 'name': self._last_session_name or '2CVRT',
@@ -385,3 +698,13 @@ class Service(BaseService):
                 'source_ok': True,
             }
         }
+        if root is None:
+            self._etag = r.headers.getRawHeaders('ETag', [None])[0]
+            self._last_modified = r.headers.getRawHeaders('Last-Modified', [None])[0]
+            self._last_body_hash = body_hash
+        else:
+            # The validators only ever describe the HTML page; keeping them
+            # now would let a 304 hand back these XML cars as the page's state.
+            self._etag = self._last_modified = self._last_body_hash = None
+        self._cached_state = state
+        return state
@@ -1,39 +1,247 @@
 from typing import Dict, List, Optional
-import re
+import functools
 import time
+import hashlib
 
-import requests
-from bs4 import BeautifulSoup
+import treq
+from twisted.internet import defer
+from twisted.internet.task import LoopingCall
 
 from livetiming.racing import Stat
 from livetiming.service import BaseService
 
+# Prefer lxml's C parsers; fall back to the stdlib XML parser and
+# BeautifulSoup if it's missing.
+try:
+    from lxml import etree as ET, html as lh
+except ImportError:
+    import xml.etree.ElementTree as ET
+    from bs4 import BeautifulSoup
+    lh = None
+
 # URLs passed to fetchers must be bytes, not strings.
 DATA_SOURCE_URL = b'https://results.ris-timing.be/2cvrt/live/live2025.htm'
 
+# Upper bound, in seconds, on the back-off between fetches while the source is failing.
+MAX_RETRY_BACKOFF = 60
+
+# Cell values meaning "no time".
+_NO_TIME = frozenset(('-', '—', 'NA', 'N/A'))
+
+# How many leading cells of a table to look at when deciding if it's the live one.
+_HEAD_CELLS = 15
+
+# Header labels (lowercased) we recognise for each column, in order of preference.
+_COLUMN_ALIASES = {
+    'pos': ('pos', 'position'),
+    'state': ('now', 'state', 'status'),
+    'num': ('num', '#', 'car', 'n°', 'nº'),
+    'team': ('team', 'name'),
+    'drivers': ('drivers', 'driver', 'pilote', 'pilotes'),
+    'last': ('last', 'last time', 'last lap', 'dernier', 'dernier tour'),
+    'best': ('best', 'best time', 'best lap', 'meilleur', 'meilleur tour'),
+    'lap': ('lap', 'laps', 'tour', 'tours'),
+    'gap': ('gap', 'ecart', 'écart'),
+}
+
 
+# The same strings come round poll after poll (best laps especially).
+@functools.lru_cache(maxsize=4096)
 def _parse_lap_time(txt: str) -> Optional[float]:
     if not txt:
         return None
     t = txt.strip()
-    if not t or t in {'-', '—', 'NA', 'N/A'}:
+    if not t or t in _NO_TIME:
         return None
-    m = re.match(r'^(?:(\d+):)?(\d{1,2})(?:[.,](\d{1,3}))?$', t)
-    if not m:
+    # Accept formats: M:SS.xxx  or  SS.xxx
+    # Split by hand rather than with a regex: this runs for every cell on every poll.
+    head, sep, frac = t.replace(',', '.').partition('.')
+    minutes, colon, seconds = head.rpartition(':')
+    if colon and not minutes.isdigit():
+        return None
+    if not seconds.isdigit() or len(seconds) > 2:
+        return None
+    if sep and (not frac.isdigit() or len(frac) > 3):
+        return None
+    try:
+        millis = int(frac.ljust(3, '0')) if frac else 0  # normalize to ms
+        return int(minutes or 0) * 60 + int(seconds) + millis / 1000.0
+    except ValueError:
+        # str.isdigit() also admits the likes of superscripts
+        return None
+
+
+def _charset(content_type: Optional[str]) -> Optional[str]:
+    """
+    The charset parameter of a Content-Type header value, if any.
+    """
+    for param in (content_type or '').split(';')[1:]:
+        key, _, value = param.partition('=')
+        if key.strip().lower() == 'charset':
+            return value.strip().strip('"\'') or None
+    return None
+
+
+def _html_encoding(html, encoding: Optional[str]) -> Optional[str]:
+    # The charset from the HTTP headers wins. Without one, read the body as
+    # UTF-8 if it is valid UTF-8, since a page with no <meta charset> would
+    # otherwise be read as latin-1; failing that, leave the parser to work it
+    # out from the document. The body itself always stays as bytes.
+    if encoding or not isinstance(html, bytes) or html.isascii():
+        return encoding
+    try:
+        html.decode('utf-8')
+    except UnicodeDecodeError:
         return None
-    minutes = int(m.group(1) or 0)
-    seconds = int(m.group(2))
-    millis = int((m.group(3) or '0').ljust(3, '0'))
-    return minutes * 60 + seconds + millis / 1000.0
+    return 'utf-8'
+
+
+def _get(url, timeout, headers=None):
+    """
+    GET url, firing with (response, body). The timeout covers reading the body
+    as well as the headers, and the body is read whatever the status so the
+    pooled connection is released.
+    """
+    from twisted.internet import reactor
+
+    @defer.inlineCallbacks
+    def get():
+        r = yield treq.get(url, headers=headers)
+        body = yield treq.content(r)
+        return r, body
+
+    return get().addTimeout(timeout, reactor)
+
+
+# Thin wrappers over the HTML tree so the scraping code below doesn't care
+# whether lxml or BeautifulSoup did the parsing.
+if lh is not None:
+    _XPATHS = {
+        'table': ET.XPath('//table'),
+        'tr': ET.XPath('.//tr'),
+        'th': ET.XPath('.//th'),
+        'td': ET.XPath('.//td'),
+        ('th', 'td'): ET.XPath('.//th|.//td'),
+    }
+    _XP_HEAD_CELLS = ET.XPath('(.//th|.//td)[position() <= {}]'.format(_HEAD_CELLS))
+
+    @functools.lru_cache(maxsize=None)
+    def _html_parser(encoding):
+        return lh.HTMLParser(encoding=encoding)
+
+    def _parse_html(html, encoding=None):
+        encoding = _html_encoding(html, encoding)
+        try:
+            parser = _html_parser(encoding) if encoding and isinstance(html, bytes) else None
+        except LookupError:
+            # Unknown charset name; let libxml2 work it out
+            parser = None
+        try:
+            return lh.fromstring(html, parser=parser)
+        except ET.ParserError:
+            # Empty document
+            return None
+
+    def _find_all(el, name):
+        return _XPATHS[name](el)
+
+    def _head_cells(table):
+        return _XP_HEAD_CELLS(table)
+
+    def _text(el) -> str:
+        return ' '.join(' '.join(el.itertext()).split()) if el is not None else ''
+else:
+    def _parse_html(html, encoding=None):
+        if isinstance(html, bytes):
+            return BeautifulSoup(html, 'html.parser', from_encoding=_html_encoding(html, encoding))
+        return BeautifulSoup(html, 'html.parser')
+
+    def _find_all(el, name):
+        return el.find_all(list(name) if isinstance(name, tuple) else name)
+
+    def _head_cells(table):
+        return table.find_all(['th', 'td'], limit=_HEAD_CELLS)
+
+    def _text(el) -> str:
+        return ' '.join(el.get_text(separator=' ', strip=True).split()) if el else ''
+
+
+def _scrape_cars(doc) -> List[Dict]:
+    table = None
+    tables = _find_all(doc, 'table')
+    for candidate in tables:
+        headers = _head_cells(candidate)
+        head_txt = ' '.join(_text(h) for h in headers).lower()
+        if any(k in head_txt for k in ['pos', 'now', 'num', 'team', 'drivers', 'best', 'last']):
+            table = candidate
+            break
+
+    if table is None and tables:
+        table = tables[0]
+    if table is None:
+        return []
+
+    cars: List[Dict] = []
+    rows = _find_all(table, 'tr')
+    header_idx = None
+    for i, tr in enumerate(rows):
+        ths = _find_all(tr, 'th')
+        tds = _find_all(tr, 'td')
+        cells = ths if ths else tds
+        labels = [_text(c).lower() for c in cells]
+        if any(lbl in labels for lbl in ['pos', 'now', 'num', '#', 'team', 'drivers', 'last', 'best', 'best time']):
+            header_idx = i
+            if ths and tds:
+                # Mixed row: index against every cell, as the data rows are
+                labels = [_text(c).lower() for c in _find_all(tr, ('th', 'td'))]
+            break
+
+    col_idx: Dict[str, int] = {}
+    if header_idx is not None:
+        # label -> index of its first occurrence
+        label_index: Dict[str, int] = {}
+        for ci, lbl in enumerate(labels):
+            label_index.setdefault(lbl, ci)
+        col_idx = {
+            k: next((label_index[a] for a in alts if a in label_index), None)
+            for k, alts in _COLUMN_ALIASES.items()
+        }
+
+        for tr in rows[header_idx + 1:]:
+            tds = _find_all(tr, 'td')
+            if not tds:
+                continue
+
+            def get(idx_name: str) -> str:
+                i = col_idx.get(idx_name)
+                return _text(tds[i]) if (i is not None and i < len(tds)) else ''
 
+            num = get('num')
+            if not num:
+                continue
 
-def _text(el) -> str:
-    import re
-    return re.sub(r'\s+', ' ', (el.get_text(separator=' ', strip=True) if el else '')).strip()
+            team_txt = get('team')
+            drv_txt = get('drivers')
+            who = team_txt or drv_txt
+
+            last_raw = get('last')
+            best_raw = get('best')
+
+            row = {
+                Stat.NUM.key: num,
+                Stat.STATE.key: get('state') or '',
+                Stat.DRIVER.key: who,
+                Stat.LAST_LAP.key: _parse_lap_time(last_raw),
+                Stat.BEST_LAP.key: _parse_lap_time(best_raw),
+            }
+            cars.append(row)
+
+    return cars
 
 
 class Service(BaseService):
-    auto_poll = True
+    # We poll and publish ourselves so fetches don't block the reactor.
+    auto_poll = False
     attribution = ['R.I.S. Timing', 'https://results.ris-timing.be/']
 
     def __init__(self, args, extra_args):
@@ -42,6 +250,17 @@ class Service(BaseService):
         self._last_session_name = None
         self._last_flag = None
         self._last_remaining = None
+        # Most recently fetched state, as handed out by getRaceState().
+        self._state = None
+        # Validators from the last parsed response, so unchanged pages come back as 304.
+        self._etag = None
+        self._last_modified = None
+        self._cached_state = None
+        # Digest of the last parsed body, for servers that don't send validators.
+        self._last_body_hash = None
+        # Consecutive fetch failures, and when we may next try the source.
+        self._failures = 0
+        self._retry_after = 0
 
     def getName(self):
         return 'RIS 2CVRT Live'
@@ -67,115 +286,103 @@ class Service(BaseService):
     def getTrackDataSpec(self):
         return []
 
+    def _restamp(self, state, **session):
+        # Shallow copy of a previously returned state with a fresh clock.
+        return {**state, 'session': {**state['session'], 'clock': int(time.time()), **session}}
+
+    def _stale_state(self):
+        # The last good state, flagged as such, if we have one.
+        if self._cached_state is not None:
+            return self._restamp(self._cached_state, source_ok=False)
+        return {
+            'cars': [],
+            'session': {
+                'name': self._last_session_name or '2CVRT',
+                'flag': self._last_flag or '',
+                'remaining': self._last_remaining,  # seconds or None
+                'clock': int(time.time()),
+                'source_ok': False,
+            }
+        }
+
+    def _back_off(self):
+        # Another consecutive failure: wait exponentially longer before the next try.
+        self._last_fetch_ok = False
+        self._failures += 1
+        self._retry_after = time.time() + min(2 ** (self._failures - 1), MAX_RETRY_BACKOFF)
+
+    def start(self):
+        LoopingCall(self._poll).start(self.getPollInterval())
+        super().start()
+
+    def _poll(self):
+        # LoopingCall waits on the returned Deferred, so polls never overlap.
+        d = self._fetchRaceState()
+        d.addCallback(self._publish)
+        d.addErrback(self._poll_failed)
+        return d
+
+    def _poll_failed(self, failure):
+        # Something broke past the fetch (parsing, say). Handle it like a failed
+        # fetch rather than leave the last state up as live; never propagate,
+        # as a failure would stop the LoopingCall.
+        self.log.failure('Poll failed: {log_failure}', failure=failure)
+        self._back_off()
+        try:
+            self._publish(self._stale_state())
+        except Exception:
+            self.log.failure('Publishing stale state failed')
+
+    def _publish(self, state):
+        self._state = state
+        self._updateAndPublishRaceState()
+
     def getRaceState(self):
+        if self._state is None:
+            return self._stale_state()
+        return self._state
+
+    @defer.inlineCallbacks
+    def _fetchRaceState(self):
         url = DATA_SOURCE_URL.decode('utf-8')
 
+        if time.time() < self._retry_after:
+            # Still backing off from a failing source.
+            return self._stale_state()
+
         try:
-            r = requests.get(url, timeout=10)
-            r.raise_for_status()
-            html = r.text
+            headers = {}
+            if self._cached_state is not None:
+                if self._etag:
+                    headers['If-None-Match'] = self._etag
+                if self._last_modified:
+                    headers['If-Modified-Since'] = self._last_modified
+            # treq pools connections, so the HTTPS connection is kept alive between polls.
+            r, html = yield _get(url, 10, headers=headers)
+            if r.code >= 400:
+                raise Exception('HTTP {}'.format(r.code))
+            self._failures = 0
+            if r.code == 304 and self._cached_state is not None:
+                self._last_fetch_ok = True
+                return self._restamp(self._cached_state)
+            charset = _charset(r.headers.getRawHeaders('Content-Type', [None])[0])
+            body_hash = hashlib.blake2b(html, digest_size=16).digest()
+            if body_hash == self._last_body_hash and self._cached_state is not None:
+                self._last_fetch_ok = True
+                return self._restamp(self._cached_state)
             self._last_fetch_ok = True
         except Exception as e:
             self.log.error('Fetch failed: {e}', e=e)
-            self._last_fetch_ok = False
-            return {
-                'cars': [],
-                'session': {
-                    'name': self._last_session_name or '2CVRT',
-                    'flag': self._last_flag or '',
-                    'remaining': self._last_remaining,
-                    'clock': int(time.time()),
-                    'source_ok': False,
-                }
-            }
+            self._back_off()
+            return self._stale_state()
 
-        soup = BeautifulSoup(html, 'html.parser')
+        doc = _parse_html(html, charset)
 
         session_name = None
         flag = None
         remaining = None
 
-        table = None
-        for candidate in soup.find_all('table'):
-            headers = [h for h in candidate.find_all(['th', 'td'])]
-            head_txt = ' '.join(_text(h).lower() for h in headers[:15])
-            if any(k in head_txt for k in ['pos', 'now', 'num', 'team', 'drivers', 'best', 'last']):
-                table = candidate
-                break
-
-        if table is None:
-            tables = soup.find_all('table')
-            if tables:
-                table = tables[0]
-
-        cars: List[Dict] = []
-        if table:
-            header_row = None
-            for tr in table.find_all('tr'):
-                ths = tr.find_all('th')
-                tds = tr.find_all('td')
-                cells = ths if ths else tds
-                labels = [_text(c).lower() for c in cells]
-                if any(lbl in labels for lbl in ['pos', 'now', 'num', '#', 'team', 'drivers', 'last', 'best', 'best time']):
-                    header_row = tr
-                    break
-
-            col_idx: Dict[str, int] = {}
-            if header_row:
-                labels = [_text(c).lower() for c in header_row.find_all(['th', 'td'])]
-                def idx(*alts) -> Optional[int]:
-                    for a in alts:
-                        if a in labels:
-                            return labels.index(a)
-                    return None
-
-                col_idx = {
-                    'pos': idx('pos', 'position'),
-                    'state': idx('now', 'state', 'status'),
-                    'num': idx('num', '#', 'car', 'n°', 'nº'),
-                    'team': idx('team', 'name'),
-                    'drivers': idx('drivers', 'driver', 'pilote', 'pilotes'),
-                    'last': idx('last', 'last time', 'last lap', 'dernier', 'dernier tour'),
-                    'best': idx('best', 'best time', 'best lap', 'meilleur', 'meilleur tour'),
-                    'lap': idx('lap', 'laps', 'tour', 'tours'),
-                    'gap': idx('gap', 'ecart', 'écart'),
-                }
-
-                started = False
-                for tr in table.find_all('tr'):
-                    if tr is header_row:
-                        started = True
-                        continue
-                    if not started:
-                        continue
-
-                    tds = tr.find_all('td')
-                    if not tds:
-                        continue
-
-                    def get(idx_name: str) -> str:
-                        i = col_idx.get(idx_name)
-                        return _text(tds[i]) if (i is not None and i < len(tds)) else ''
-
-                    num = get('num')
-                    if not num:
-                        continue
-
-                    team_txt = get('team')
-                    drv_txt = get('drivers')
-                    who = team_txt or drv_txt
-
-                    last_raw = get('last')
-                    best_raw = get('best')
-
-                    row = {
-                        Stat.NUM.key: num,
-                        Stat.STATE.key: get('state') or '',
-                        Stat.DRIVER.key: who,
-                        Stat.LAST_LAP.key: _parse_lap_time(last_raw),
-                        Stat.BEST_LAP.key: _parse_lap_time(best_raw),
-                    }
-                    cars.append(row)
+        cars = _scrape_cars(doc) if doc is not None else []
 
         if session_name:
             self._last_session_name = session_name
@@ -184,7 +391,7 @@ class Service(BaseService):
         if remaining is not None:
             self._last_remaining = remaining
 
-        return {
+        state = {
             'cars': cars,
             'session': {
                 'name': self._last_session_name or '2CVRT',
@@ -194,3 +401,8 @@ class Service(BaseService):
                 'source_ok': True,
             }
         }
+        self._etag = r.headers.getRawHeaders('ETag', [None])[0]
+        self._last_modified = r.headers.getRawHeaders('Last-Modified', [None])[0]
+        self._last_body_hash = body_hash
+        self._cached_state = state
+        return state
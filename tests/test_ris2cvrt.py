@@ -0,0 +1,436 @@
+import importlib
+import sys
+import time
+
+import pytest
+
+pytest.importorskip('livetiming.service')
+pytest.importorskip('treq')
+
+MODULES = ['livetiming.service.plugins.ris2cvrt', 'livetiming.ris2cvrt']
+
+
+@pytest.fixture(params=MODULES)
+def ris(request):
+    return importlib.import_module(request.param)
+
+
+@pytest.fixture(params=[(m, b) for m in MODULES for b in ('lxml', 'bs4')], ids=lambda p: '-'.join(p))
+def ris_backend(request, monkeypatch):
+    """
+    A fresh import of the module, with its HTML helpers on the given backend.
+    """
+    name, backend = request.param
+    if backend == 'bs4':
+        pytest.importorskip('bs4')
+        # Importing lxml now fails, so the module falls back to BeautifulSoup.
+        monkeypatch.setitem(sys.modules, 'lxml', None)
+    else:
+        pytest.importorskip('lxml')
+    monkeypatch.delitem(sys.modules, name, raising=False)
+    module = importlib.import_module(name)
+    yield module
+    sys.modules.pop(name, None)
+
+
+@pytest.mark.parametrize('txt, expected', [
+    ('1:23.456', 83.456),
+    ('23.456', 23.456),
+    ('1:23,4', 83.4),
+    ('0:05.12', 5.12),
+    ('59', 59.0),
+    ('12:03', 723.0),
+    ('  1:23.456\n', 83.456),
+    ('', None),
+    (None, None),
+    ('-', None),
+    ('—', None),
+    ('N/A', None),
+    ('NA', None),
+    (':23', None),
+    ('12.', None),
+    ('.5', None),
+    ('1:', None),
+    ('123', None),
+    ('1:2:03', None),
+    ('1:23.4567', None),
+    ('1:23.4.5', None),
+    ('1,2.3', None),
+    ('²3', None),
+    ('+1:23', None),
+    ('1 :23', None),
+    ('PIT', None),
+])
+def test_parse_lap_time(ris, txt, expected):
+    assert ris._parse_lap_time(txt) == expected
+
+
+LIVE_PAGE = '''<html><body>
+<table><tr><td>Race : 2CV 24H</td></tr></table>
+<table>
+  <tr><th>Pos</th><th>N°</th><th>Team</th><th>Drivers</th><th>Last Time</th><th>Best Time</th><th>Now</th></tr>
+  <tr><td>1</td><td> 12 </td><td>Équipe  <b>Rouge</b></td><td>A / B</td><td>1:23.456</td><td>1:22,1</td><td>RUN</td></tr>
+  <tr><td colspan="7"></td></tr>
+  <tr><td>2</td><td>7</td><td></td><td>C / D</td><td>-</td><td>59.9</td><td>PIT</td></tr>
+</table>
+</body></html>'''
+
+
+def test_scrape_cars(ris_backend):
+    doc = ris_backend._parse_html(LIVE_PAGE)
+    Stat = ris_backend.Stat
+    assert ris_backend._scrape_cars(doc) == [
+        {Stat.NUM.key: '12', Stat.STATE.key: 'RUN', Stat.DRIVER.key: 'Équipe Rouge',
+         Stat.LAST_LAP.key: 83.456, Stat.BEST_LAP.key: 82.1},
+        {Stat.NUM.key: '7', Stat.STATE.key: 'PIT', Stat.DRIVER.key: 'C / D',
+         Stat.LAST_LAP.key: None, Stat.BEST_LAP.key: 59.9},
+    ]
+
+
+def test_find_all_and_text(ris_backend):
+    doc = ris_backend._parse_html(LIVE_PAGE)
+    tables = ris_backend._find_all(doc, 'table')
+    assert len(tables) == 2
+    header = ris_backend._find_all(tables[1], 'tr')[0]
+    labels = [ris_backend._text(c) for c in ris_backend._find_all(header, ('th', 'td'))]
+    assert labels == ['Pos', 'N°', 'Team', 'Drivers', 'Last Time', 'Best Time', 'Now']
+    assert len(ris_backend._head_cells(tables[1])) == 15
+
+
+@pytest.mark.parametrize('body, charset', [
+    (LIVE_PAGE.encode('utf-8'), 'utf-8'),
+    (LIVE_PAGE.encode('iso-8859-1'), 'iso-8859-1'),
+    # No charset in the headers either
+    (LIVE_PAGE.encode('utf-8'), None),
+    # XHTML, with an XML declaration ahead of the markup
+    (('<?xml version="1.0" encoding="utf-8"?>\n' + LIVE_PAGE).encode('utf-8'), None),
+    (('<?xml version="1.0" encoding="utf-8"?>\n' + LIVE_PAGE).encode('utf-8'), 'utf-8'),
+])
+def test_scrape_cars_without_meta_charset(ris_backend, body, charset):
+    # LIVE_PAGE has no <meta charset>, so only the HTTP header says how to decode it.
+    doc = ris_backend._parse_html(body, charset)
+    cars = ris_backend._scrape_cars(doc)
+    assert [c[ris_backend.Stat.NUM.key] for c in cars] == ['12', '7']
+    assert cars[0][ris_backend.Stat.DRIVER.key] == 'Équipe Rouge'
+
+
+@pytest.mark.parametrize('content_type, expected', [
+    ('text/html; charset=UTF-8', 'UTF-8'),
+    ('text/html;charset="iso-8859-1"', 'iso-8859-1'),
+    ('text/html; Charset=utf-8; foo=bar', 'utf-8'),
+    ('text/html', None),
+    (None, None),
+])
+def test_charset(ris, content_type, expected):
+    assert ris._charset(content_type) == expected
+
+
+class _StallingTreq:
+    """
+    Answers with headers straight away, then never delivers the body.
+    """
+
+    def __init__(self, code=200):
+        self.code = code
+        self.body = None
+
+    def get(self, url, headers=None, **kwargs):
+        from twisted.internet import defer
+
+        class Response:
+            code = self.code
+        return defer.succeed(Response())
+
+    def content(self, response):
+        from twisted.internet import defer
+        self.body = defer.Deferred()
+        return self.body
+
+
+def test_get_times_out_stalled_body(ris, monkeypatch):
+    import twisted.internet
+    from twisted.internet import defer, task
+
+    clock = task.Clock()
+    monkeypatch.setattr(twisted.internet, 'reactor', clock, raising=False)
+    fake = _StallingTreq()
+    monkeypatch.setattr(ris, 'treq', fake)
+
+    failures = []
+    ris._get('http://example.invalid/', 10).addErrback(failures.append)
+    clock.advance(9)
+    assert not failures
+    clock.advance(1)
+    assert failures and failures[0].check(defer.TimeoutError)
+    # The stalled body read itself was cancelled, not left dangling.
+    assert fake.body.called
+
+
+def test_get_reads_body_of_error_responses(ris, monkeypatch):
+    import twisted.internet
+    from twisted.internet import task
+
+    monkeypatch.setattr(twisted.internet, 'reactor', task.Clock(), raising=False)
+    fake = _StallingTreq(code=404)
+    monkeypatch.setattr(ris, 'treq', fake)
+
+    results = []
+    ris._get('http://example.invalid/', 10).addCallback(results.append)
+    fake.body.callback(b'not found')
+    assert results[0][0].code == 404
+    assert results[0][1] == b'not found'
+
+
+def test_remaining_clock_held_then_missing():
+    from livetiming.ris2cvrt import _RemainingClock
+
+    clock = _RemainingClock()
+    assert clock.update('00:30:00', 1000.0) == 1800
+    # Clock held for ten minutes of polls (e.g. a stoppage)...
+    for t in range(1001, 1601):
+        assert clock.update('00:30:00', float(t)) == 1800
+    # ...then <remain> disappears: count down from when it was last seen.
+    assert clock.update('', 1605.0) == 1795
+
+
+def test_remaining_clock():
+    from livetiming.ris2cvrt import _RemainingClock
+
+    clock = _RemainingClock()
+    assert clock.update('', 0.0) is None
+    assert clock.update('1:02:03', 0.0) == 3723
+    assert clock.update('05:00', 10.0) == 300
+    assert clock.update('45', 20.0) == 45
+    assert clock.update('soon', 21.0) is None
+    assert clock.update('', 30.0) == 35
+    assert clock.update('', 100.0) == 0
+
+
+class _FakeTreq:
+    """
+    Serves canned (code, body, headers) responses by URL, recording each request.
+    Unknown URLs get a 404.
+    """
+
+    def __init__(self):
+        self.responses = {}
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        from twisted.internet import defer
+        from twisted.web.http_headers import Headers
+
+        self.requests.append((url, dict(headers or {})))
+        code, body, response_headers = self.responses.get(url, (404, b'', {}))
+
+        class Response:
+            pass
+        response = Response()
+        response.code = code
+        response.headers = Headers({k: [v] for k, v in response_headers.items()})
+        response.body = body
+        return defer.succeed(response)
+
+    def content(self, response):
+        from twisted.internet import defer
+        return defer.succeed(response.body)
+
+    def urls(self):
+        return [url for url, _ in self.requests]
+
+
+@pytest.fixture
+def service(ris, monkeypatch):
+    """
+    A Service wired to a _FakeTreq, without the livetiming-core plumbing.
+    """
+    import logging
+    import twisted.internet
+    from twisted.internet import task
+    from twisted.logger import Logger
+
+    def init(self, args, extra_args):
+        self.log = Logger()
+    monkeypatch.setattr(ris.BaseService, '__init__', init)
+    if hasattr(ris, '_setup_out_logger'):
+        monkeypatch.setattr(ris, '_setup_out_logger', lambda: logging.getLogger('test_ris2cvrt'))
+    monkeypatch.setattr(twisted.internet, 'reactor', task.Clock(), raising=False)
+    monkeypatch.setattr(ris, 'treq', _FakeTreq())
+
+    svc = ris.Service(None, None)
+    monkeypatch.setattr(svc, '_updateAndPublishRaceState', lambda: None)
+    return svc
+
+
+def _fetch(service):
+    states = []
+    service._fetchRaceState().addCallback(states.append)
+    return states[0]
+
+
+def _serve_page(ris, body=LIVE_PAGE.encode('utf-8'), code=200, **headers):
+    url = ris.DATA_SOURCE_URL.decode('utf-8')
+    ris.treq.responses[url] = (code, body, {'Content-Type': 'text/html; charset=utf-8', **headers})
+    return url
+
+
+def _nums(state, ris):
+    return [car[ris.Stat.NUM.key] for car in state['cars']]
+
+
+def test_poll_failure_publishes_stale_state(ris, service, monkeypatch):
+    _serve_page(ris)
+    service._poll()
+    assert _nums(service.getRaceState(), ris) == ['12', '7']
+
+    # A new page the scraper chokes on
+    _serve_page(ris, LIVE_PAGE.replace('PIT', 'RUN').encode('utf-8'))
+
+    def broken(doc):
+        raise ValueError('unexpected markup')
+    monkeypatch.setattr(ris, '_scrape_cars', broken)
+    service._poll()
+
+    state = service.getRaceState()
+    assert _nums(state, ris) == ['12', '7']
+    assert state['session']['source_ok'] is False
+    assert service._failures == 1
+    assert service._retry_after > time.time()
+
+
+LIVE_XML = b'''<?xml version="1.0" encoding="utf-8"?>
+<live>
+  <lineinfo><seance>Race</seance><messageDC2>GREEN FLAG</messageDC2><remain>01:00:00</remain></lineinfo>
+  <ligne><num>33</num><team>Bleu</team><last>1:30.5</last><best>1:29.0</best><now>RUN</now></ligne>
+</live>'''
+
+
+def _serve_xml(ris, body=LIVE_XML, code=200):
+    url = ris.DATA_SOURCE_URL.decode('utf-8').rsplit('.', 1)[0] + '.xml'
+    ris.treq.responses[url] = (code, body, {'Content-Type': 'text/xml'})
+    return url
+
+
+@pytest.mark.parametrize('ris', ['livetiming.ris2cvrt'], indirect=True)
+def test_malformed_xml_feed_backs_off(ris, service):
+    xml_url = _serve_xml(ris)
+    page_url = _serve_page(ris)
+    assert _nums(_fetch(service), ris) == ['33']
+    assert service._xml_url == xml_url
+
+    # The feed still claims to be XML, but isn't well-formed
+    _serve_xml(ris, b'<?xml version="1.0"?><live><ligne>')
+    assert _nums(_fetch(service), ris) == ['12', '7']
+    assert service._xml_failures == 1
+    assert service._xml_retry_after > time.time()
+
+    # Backing off: only the HTML page is fetched
+    del ris.treq.requests[:]
+    _fetch(service)
+    assert ris.treq.urls() == [page_url]
+
+
+@pytest.mark.parametrize('ris', ['livetiming.ris2cvrt'], indirect=True)
+def test_malformed_xml_feed_is_not_adopted(ris, service):
+    _serve_xml(ris, b'<?xml version="1.0"?><live><ligne>')
+    _serve_page(ris)
+    assert _nums(_fetch(service), ris) == ['12', '7']
+    assert service._xml_url is None
+    assert service._xml_next_probe > time.time()
+
+
+EMPTY_XML = b'''<?xml version="1.0" encoding="utf-8"?>
+<live><lineinfo><seance>Race</seance></lineinfo></live>'''
+
+
+@pytest.mark.parametrize('ris', ['livetiming.ris2cvrt'], indirect=True)
+def test_xml_feed_without_cars_falls_back_to_html(ris, service):
+    _serve_xml(ris, EMPTY_XML)
+    _serve_page(ris)
+    state = _fetch(service)
+    assert _nums(state, ris) == ['12', '7']
+    assert state['session']['source_ok'] is True
+    assert service._xml_url is None
+
+    # A feed we'd found that stops listing cars is backed off from in the same way
+    service._xml_next_probe = 0
+    _serve_xml(ris)
+    assert _nums(_fetch(service), ris) == ['33']
+    _serve_xml(ris, EMPTY_XML)
+    assert _nums(_fetch(service), ris) == ['12', '7']
+    assert service._xml_failures == 1
+
+
+def test_not_modified_reuses_last_cars(ris, service):
+    page_url = _serve_page(ris, ETag='"v1"', **{'Last-Modified': 'Sat, 11 Oct 2025 12:00:00 GMT'})
+    assert _nums(_fetch(service), ris) == ['12', '7']
+
+    ris.treq.responses[page_url] = (304, b'', {})
+    state = _fetch(service)
+    assert _nums(state, ris) == ['12', '7']
+    assert state['session']['source_ok'] is True
+    assert ris.treq.requests[-1] == (page_url, {
+        'If-None-Match': '"v1"',
+        'If-Modified-Since': 'Sat, 11 Oct 2025 12:00:00 GMT',
+    })
+
+
+@pytest.mark.parametrize('ris', ['livetiming.ris2cvrt'], indirect=True)
+def test_xml_state_clears_html_validators(ris, service):
+    page_url = _serve_page(ris, ETag='"v1"')
+    _fetch(service)
+
+    service._xml_next_probe = 0
+    _serve_xml(ris)
+    assert _nums(_fetch(service), ris) == ['33']
+
+    # The feed goes away. The unchanged page must be fetched and parsed in full:
+    # a 304 or a body-hash match would bring the XML cars back as the page's.
+    _serve_xml(ris, code=500)
+    assert _nums(_fetch(service), ris) == ['12', '7']
+    assert ris.treq.requests[-1] == (page_url, {})
+
+
+def test_identical_body_is_not_reparsed(ris, service, monkeypatch):
+    parsed = []
+
+    def parse_html(html, encoding=None):
+        parsed.append(html)
+        return parse(html, encoding)
+    parse = ris._parse_html
+    monkeypatch.setattr(ris, '_parse_html', parse_html)
+
+    _serve_page(ris)
+    first = _fetch(service)
+    second = _fetch(service)
+    assert len(parsed) == 1
+    assert second['cars'] == first['cars']
+    assert second['session']['source_ok'] is True
+
+    _serve_page(ris, LIVE_PAGE.replace('PIT', 'RUN').encode('utf-8'))
+    _fetch(service)
+    assert len(parsed) == 2
+
+
+def test_failing_source_serves_stale_state_and_backs_off(ris, service):
+    page_url = _serve_page(ris)
+    _fetch(service)
+
+    ris.treq.responses[page_url] = (500, b'oops', {})
+    delays = []
+    for _ in range(3):
+        state = _fetch(service)
+        assert _nums(state, ris) == ['12', '7']
+        assert state['session']['source_ok'] is False
+        delays.append(round(service._retry_after - time.time()))
+
+        # Inside the back-off window the source isn't touched at all
+        fetched = len(ris.treq.requests)
+        assert _fetch(service)['session']['source_ok'] is False
+        assert len(ris.treq.requests) == fetched
+        service._retry_after = 0
+    assert delays == [1, 2, 4]
+
+    _serve_page(ris)
+    assert _fetch(service)['session']['source_ok'] is True
+    assert service._failures == 0